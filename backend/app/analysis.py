@@ -1,7 +1,22 @@
+import os
+from typing import Optional
+
+from .schemas import SafetyAnalysisResult
+
 # ---------------------------------------------------------
 # Simple keyword-based audio analyzer (placeholder for LLM)
 # ---------------------------------------------------------
 
+# LLM danger_level at or above which a session is escalated to DANGER
+DANGER_LEVEL_THRESHOLD = int(os.getenv("DANGER_LEVEL_THRESHOLD", "6"))
+
+# Model cascade: screening scores below SCREENING_CLEAR_BELOW are cleared by the
+# cheap tier; every other window goes to the full safety model. SCREENING_FALLBACK_ABOVE
+# does not affect routing: it only decides when the screening result is used if the
+# full model fails
+SCREENING_CLEAR_BELOW = int(os.getenv("SCREENING_CLEAR_BELOW", "3"))
+SCREENING_FALLBACK_ABOVE = int(os.getenv("SCREENING_FALLBACK_ABOVE", "6"))
+
 DANGER_KEYWORDS = [
     "give me your phone",
     "give me the phone",
@@ -36,3 +51,24 @@ def analyze_text(text: str) -> dict:
         "risk": "SAFE",
         "reason": "No dangerous keywords detected",
     }
+
+
+def screening_decision(
+    screening: Optional[SafetyAnalysisResult],
+    clear_below: int = SCREENING_CLEAR_BELOW,
+    fallback_above: int = SCREENING_FALLBACK_ABOVE,
+) -> str:
+    """
+    Classify a first-tier (screening) result for the model cascade.
+    Returns "clear" below `clear_below` (the cheap tier decides); otherwise the
+    window is escalated to the full model and the result is "danger" above
+    `fallback_above` (screening may stand in if the full model fails) or "escalate".
+    A missing result (screening failed) counts as "escalate".
+    """
+    if screening is None:
+        return "escalate"
+    if screening.danger_level < clear_below:
+        return "clear"
+    if screening.danger_level > fallback_above:
+        return "danger"
+    return "escalate"
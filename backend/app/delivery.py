@@ -0,0 +1,267 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+# ---------------------------------------------------------
+# Rate-limit-aware notification delivery
+# ---------------------------------------------------------
+#
+# Every destination (Discord webhook / ntfy topic) gets its own token
+# bucket and worker. Critical (DANGER*) events are sent first and never
+# wait for a digest; everything else is coalesced into one message per
+# DIGEST_WINDOW_SECONDS. 429 responses block the bucket for Retry-After;
+# connection errors and 5xx responses are retried with exponential backoff.
+
+NOTIFY_RATE_PER_SECOND = float(os.getenv("NOTIFY_RATE_PER_SECOND", "2"))
+NOTIFY_BURST = float(os.getenv("NOTIFY_BURST", "5"))
+DIGEST_WINDOW_SECONDS = float(os.getenv("NOTIFY_DIGEST_WINDOW_SECONDS", "3"))
+# Only digests give up after this many failed attempts; critical events retry until delivered
+MAX_DELIVERY_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+# Exponential backoff for connection errors / 5xx responses (429s use Retry-After instead)
+RETRY_BACKOFF_SECONDS = float(os.getenv("NOTIFY_RETRY_BACKOFF_SECONDS", "1"))
+RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFY_RETRY_BACKOFF_MAX_SECONDS", "30"))
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("NOTIFY_SHUTDOWN_DRAIN_SECONDS", "10"))
+
+# Max message length accepted by each channel
+MAX_CONTENT_LENGTH = {
+    "discord": 2000,
+    "ntfy": 4096,
+}
+
+Sender = Callable[[str, str], Awaitable[Optional[httpx.Response]]]
+
+
+class TokenBucket:
+    """
+    Classic token bucket with an extra `blocked_until` set from
+    Retry-After / rate-limit headers returned by the server.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token can be consumed (0 if available now)."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def time_until_rested(self, now: float) -> float:
+        """Seconds until the bucket is unblocked and full again, i.e. indistinguishable from a new one."""
+        self._refill(now)
+        return max(self.blocked_until - now, (self.capacity - self.tokens) / self.rate, 0.0)
+
+    def block_for(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """
+    Extract how long to back off from a rate-limited response.
+    Supports the standard Retry-After header and Discord's JSON `retry_after`.
+    """
+    header = response.headers.get("Retry-After")
+    if header is not None:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+
+    try:
+        retry_after = response.json().get("retry_after")
+        if retry_after is not None:
+            return float(retry_after)
+    except Exception:
+        pass
+
+    return None
+
+
+class _Destination:
+    def __init__(self, channel: str, target: str):
+        self.channel = channel
+        self.target = target
+        self.bucket = TokenBucket(NOTIFY_RATE_PER_SECOND, NOTIFY_BURST)
+        self.critical: deque = deque()
+        self.pending: deque = deque()
+        self.digest_due: Optional[float] = None
+        self.attempts = 0
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class NotificationDispatcher:
+    """
+    Queues notifications per destination and delivers them in the background.
+    `senders` maps a channel name ("discord", "ntfy") to a coroutine
+    `send(target, content)` returning the HTTP response (or None on error).
+    """
+
+    def __init__(self, senders: Dict[str, Sender]):
+        self.senders = senders
+        self.destinations: Dict[Tuple[str, str], _Destination] = {}
+        self.closing = False
+
+    def enqueue(self, channel: str, target: str, content: str, critical: bool) -> None:
+        """Queue a message; never blocks the caller."""
+        key = (channel, target)
+        dest = self.destinations.get(key)
+        if dest is None:
+            dest = _Destination(channel, target)
+            self.destinations[key] = dest
+
+        if critical:
+            dest.critical.append(content)
+        else:
+            if self.closing:
+                dest.digest_due = None
+            elif not dest.pending:
+                dest.digest_due = time.monotonic() + DIGEST_WINDOW_SECONDS
+            dest.pending.append(content)
+
+        dest.wake.set()
+        if dest.task is None or dest.task.done():
+            dest.task = asyncio.create_task(self._worker(dest))
+
+    def _build_digest(self, dest: _Destination) -> Tuple[str, int]:
+        """Join as many pending messages as fit in one channel message."""
+        limit = MAX_CONTENT_LENGTH.get(dest.channel, 2000)
+        if len(dest.pending) == 1:
+            return dest.pending[0][:limit], 1
+
+        parts = []
+        length = 0
+        for content in dest.pending:
+            added = len(content) + 2
+            if parts and length + added > limit:
+                break
+            parts.append(content[:limit])
+            length += added
+        return "\n\n".join(parts)[:limit], len(parts)
+
+    async def aclose(self, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> None:
+        """
+        Flush queued notifications on shutdown: open digest windows are sent
+        right away, and workers get up to `timeout` seconds before being cancelled.
+        """
+        self.closing = True
+        tasks = []
+        for dest in list(self.destinations.values()):
+            dest.digest_due = None
+            dest.wake.set()
+            if dest.task is not None and not dest.task.done():
+                tasks.append(dest.task)
+
+        if not tasks:
+            return
+
+        _, still_running = await asyncio.wait(tasks, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        if still_running:
+            print(
+                f"[WalkGuardianAI] {len(still_running)} notification destination(s) "
+                f"not drained before shutdown"
+            )
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+    async def _worker(self, dest: _Destination) -> None:
+        try:
+            while True:
+                await self._deliver(dest)
+                # Keep the destination (and its rate-limit state) until the bucket has
+                # recovered, so a Retry-After / exhausted bucket still applies to the next message
+                rested_in = dest.bucket.time_until_rested(time.monotonic())
+                if rested_in <= 0 or self.closing:
+                    break
+                dest.wake.clear()
+                try:
+                    await asyncio.wait_for(dest.wake.wait(), timeout=rested_in)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Forget idle destinations so the dict does not grow with every webhook ever seen
+            key = (dest.channel, dest.target)
+            if not dest.critical and not dest.pending and self.destinations.get(key) is dest:
+                del self.destinations[key]
+
+    async def _deliver(self, dest: _Destination) -> None:
+        send = self.senders[dest.channel]
+
+        while dest.critical or dest.pending:
+            now = time.monotonic()
+
+            if dest.critical:
+                content, count, critical = dest.critical[0], 1, True
+            elif dest.digest_due is not None and now < dest.digest_due:
+                # Wait for the digest window, but wake up early for critical events
+                dest.wake.clear()
+                try:
+                    await asyncio.wait_for(dest.wake.wait(), timeout=dest.digest_due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            else:
+                content, count = self._build_digest(dest)
+                critical = False
+
+            wait = dest.bucket.wait_time(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            dest.bucket.consume()
+            response = await send(dest.target, content)
+
+            if response is None or response.status_code == 429 or response.status_code >= 500:
+                dest.attempts += 1
+                if response is not None and response.status_code == 429:
+                    retry_after = _retry_after_seconds(response) or 1.0
+                    reason = "rate limited"
+                else:
+                    retry_after = min(
+                        RETRY_BACKOFF_SECONDS * 2 ** (dest.attempts - 1), RETRY_BACKOFF_MAX_SECONDS
+                    )
+                    reason = "failed" if response is None else f"returned {response.status_code}"
+                dest.bucket.block_for(retry_after)
+                print(
+                    f"[WalkGuardianAI] {dest.channel} {reason}, "
+                    f"retrying in {retry_after:.2f}s (attempt {dest.attempts})"
+                )
+                if critical or dest.attempts < MAX_DELIVERY_ATTEMPTS:
+                    continue
+                print(f"[WalkGuardianAI] {dest.channel} digest dropped after {dest.attempts} attempts")
+
+            dest.attempts = 0
+            if critical:
+                dest.critical.popleft()
+            else:
+                for _ in range(count):
+                    dest.pending.popleft()
+                if dest.pending:
+                    dest.digest_due = None  # leftovers go out as soon as tokens allow
+
+            # Discord tells us upfront when the bucket is exhausted
+            if response is not None and response.headers.get("X-RateLimit-Remaining") == "0":
+                try:
+                    dest.bucket.block_for(float(response.headers.get("X-RateLimit-Reset-After", "0")))
+                except ValueError:
+                    pass
@@ -0,0 +1,515 @@
+# ---------------------------------------------------------
+# Offline evaluation of the safety-analysis prompt
+# ---------------------------------------------------------
+#
+# Streams a JSONL corpus of labelled transcripts through the same
+# TranscriptStore windowing and parse_model_response used by the backend,
+# and reports throughput, latency, parse failures and a confusion matrix.
+#
+# Corpus format (one JSON object per line):
+#   {"id": "s1", "entries": ["chunk 1", "chunk 2"], "danger_type": "physical_threat", "danger_level": 8}
+# "text" may be used instead of "entries"; "dangerous": true/false may replace "danger_level".
+#
+# Usage (from the backend/ directory):
+#   python -m app.evaluate run corpus.jsonl --backend=keyword
+#   python -m app.evaluate run corpus.jsonl --backend=llama --base_url=http://localhost:8321 --concurrency=8
+#   python -m app.evaluate run corpus.jsonl --backend=mypkg.stub:respond --mode=process --concurrency=4
+#   python -m app.evaluate run corpus.jsonl --backend=llama --base_url=http://localhost:8321 \
+#       --screening_backend=llama --screening_model_id=granite-small --clear_below=3 --fallback_above=6
+
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+import fire
+
+from .analysis import (
+    DANGER_LEVEL_THRESHOLD,
+    SCREENING_CLEAR_BELOW,
+    SCREENING_FALLBACK_ABOVE,
+    analyze_text,
+    screening_decision,
+)
+from .response_parser import parse_model_response
+from .transcript_store import TranscriptStore
+
+DEFAULT_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "prompts", "safety_analysis_prompt.txt")
+SCREENING_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "prompts", "screening_prompt.txt")
+
+# (system prompt, transcript window) -> raw model text
+QueryFn = Callable[[str, str], str]
+
+
+def _keyword_stub(prompt: str, transcript: str) -> str:
+    """
+    Local stub backend: keyword analyzer rendered in the model's output format,
+    so the full parsing path is exercised without any network calls.
+    """
+    result = analyze_text(transcript)
+    danger = result["risk"] == "DANGER"
+    return (
+        f"danger_level: {8 if danger else 2}\n"
+        f"danger_type: {'physical_threat' if danger else 'unknown'}\n"
+        f"summary: {result['reason']}\n"
+        f"recommended_action: {'Call for help' if danger else 'Continue walking'}"
+    )
+
+
+def build_query_fn(backend: str, prompt: str, base_url: Optional[str], model_id: Optional[str]) -> QueryFn:
+    """
+    Resolve a backend name into a query function:
+    - "keyword": local keyword stub
+    - "llama":   Llama Stack endpoint at base_url
+    - "module:function": any importable callable (prompt, transcript) -> str
+    """
+    if backend == "keyword":
+        return _keyword_stub
+
+    if backend == "llama":
+        if not base_url or not model_id:
+            raise ValueError("base_url and model_id are required for the llama backend")
+        from .llama_client import LlamaBackend
+
+        client = LlamaBackend(base_url=base_url, prompt=prompt, model_id=model_id)
+        return lambda _prompt, transcript: client.query_model(transcript)
+
+    module_name, _, attr = backend.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown backend '{backend}', expected keyword, llama or module:function")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def iter_corpus(path: str, limit: Optional[int] = None) -> Iterator[dict]:
+    """Lazily read labelled samples from a JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        count = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line)
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+
+class Pipeline:
+    """
+    Query functions and prompts for one evaluation run.
+    With a `screen_query` the run mirrors CascadeBackend: the screening tier
+    clears windows below `clear_below`, everything else goes to `query`;
+    `fallback_above` only decides when screening stands in for a failed `query`.
+    """
+
+    def __init__(
+        self,
+        query: QueryFn,
+        prompt: str,
+        screen_query: Optional[QueryFn] = None,
+        screen_prompt: str = "",
+        clear_below: int = SCREENING_CLEAR_BELOW,
+        fallback_above: int = SCREENING_FALLBACK_ABOVE,
+    ):
+        self.query = query
+        self.prompt = prompt
+        self.screen_query = screen_query
+        self.screen_prompt = screen_prompt
+        self.clear_below = clear_below
+        self.fallback_above = fallback_above
+
+
+def build_pipeline(config: dict) -> Pipeline:
+    """Build a Pipeline from plain (picklable) settings, so process workers can rebuild it."""
+    query = build_query_fn(config["backend"], config["prompt"], config["base_url"], config["model_id"])
+    screen_query = None
+    if config.get("screening_backend"):
+        screen_query = build_query_fn(
+            config["screening_backend"],
+            config["screening_prompt"],
+            config["screening_base_url"] or config["base_url"],
+            config["screening_model_id"],
+        )
+    return Pipeline(
+        query=query,
+        prompt=config["prompt"],
+        screen_query=screen_query,
+        screen_prompt=config.get("screening_prompt", ""),
+        clear_below=config.get("clear_below", SCREENING_CLEAR_BELOW),
+        fallback_above=config.get("fallback_above", SCREENING_FALLBACK_ABOVE),
+    )
+
+
+def evaluate_sample(pipeline: Pipeline, sample: dict, window: int, threshold: int) -> dict:
+    """
+    Run a single sample through windowing, the model(s) and the parser.
+    Always returns a result dict; failures are recorded, not raised.
+    """
+    store = TranscriptStore(max_entries=window)
+    entries = sample.get("entries") or [sample.get("text", "")]
+    for entry in entries:
+        store.add_entry(entry)
+    transcript = store.get_entries()
+
+    expected_dangerous = sample.get("dangerous")
+    if expected_dangerous is None and sample.get("danger_level") is not None:
+        expected_dangerous = int(sample["danger_level"]) >= threshold
+
+    result = {
+        "id": sample.get("id"),
+        "expected_type": sample.get("danger_type", "unknown"),
+        "expected_dangerous": expected_dangerous,
+        "predicted_type": None,
+        "predicted_level": None,
+        "decided_by": "full",
+        "error": None,
+        "parse_error": False,
+    }
+
+    started = time.perf_counter()
+
+    # First tier (cascade only); a failed screening is escalated, like CascadeBackend does
+    screening = None
+    decision = None
+    if pipeline.screen_query is not None:
+        result["screened"] = True
+        try:
+            raw_screening = pipeline.screen_query(pipeline.screen_prompt, transcript)
+        except Exception as e:
+            result["screening_error"] = f"query failed: {e}"
+        else:
+            try:
+                screening = parse_model_response(raw_screening)
+            except Exception as e:
+                result["screening_parse_error"] = True
+                result["screening_error"] = f"parse failed: {e}"
+        decision = screening_decision(screening, pipeline.clear_below, pipeline.fallback_above)
+        if decision == "clear":
+            result["decided_by"] = "screening"
+            result["predicted_type"] = screening.danger_type
+            result["predicted_level"] = screening.danger_level
+            result["latency"] = time.perf_counter() - started
+            return result
+
+    try:
+        raw = pipeline.query(pipeline.prompt, transcript)
+    except Exception as e:
+        result["latency"] = time.perf_counter() - started
+        if decision == "danger" and screening is not None:
+            result["decided_by"] = "screening_fallback"
+            result["predicted_type"] = screening.danger_type
+            result["predicted_level"] = screening.danger_level
+            return result
+        result["error"] = f"query failed: {e}"
+        return result
+    result["latency"] = time.perf_counter() - started
+
+    try:
+        parsed = parse_model_response(raw)
+    except Exception as e:
+        result["parse_error"] = True
+        result["error"] = f"parse failed: {e}"
+        return result
+
+    result["predicted_type"] = parsed.danger_type
+    result["predicted_level"] = parsed.danger_level
+    return result
+
+
+# Process pool workers keep their own pipeline, built once per process
+_worker_pipeline: Optional[Pipeline] = None
+
+
+def _init_worker(config: dict) -> None:
+    global _worker_pipeline
+    _worker_pipeline = build_pipeline(config)
+
+
+def _worker_evaluate(sample: dict, window: int, threshold: int) -> dict:
+    return evaluate_sample(_worker_pipeline, sample, window, threshold)
+
+
+class _RateLimiter:
+    """Spaces out requests so at most `max_rps` start per second (no limit if falsy)."""
+
+    def __init__(self, max_rps: Optional[float]):
+        self.interval = 1.0 / max_rps if max_rps else 0.0
+        self.next_slot = time.monotonic()
+
+    def reserve(self) -> float:
+        """Reserve the next slot and return how long to wait for it."""
+        if not self.interval:
+            return 0.0
+        now = time.monotonic()
+        wait = self.next_slot - now
+        self.next_slot = max(now, self.next_slot) + self.interval
+        return max(wait, 0.0)
+
+
+async def _run_async(samples, pipeline, window, threshold, concurrency, max_rps) -> List[dict]:
+    """
+    Bounded pool of coroutines pulling samples from a shared iterator.
+    Blocking queries run on a dedicated thread pool sized to `concurrency`.
+    """
+    results: List[dict] = []
+    limiter = _RateLimiter(max_rps)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        async def worker():
+            for sample in samples:
+                wait = limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                results.append(
+                    await loop.run_in_executor(
+                        executor, evaluate_sample, pipeline, sample, window, threshold
+                    )
+                )
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def _run_process_pool(samples, config, window, threshold, concurrency, max_rps) -> List[dict]:
+    """Process pool with at most 2 * concurrency samples in flight, submitted at most max_rps per second."""
+    results: List[dict] = []
+    in_flight = []
+    limiter = _RateLimiter(max_rps)
+    with ProcessPoolExecutor(
+        max_workers=concurrency,
+        initializer=_init_worker,
+        initargs=(config,),
+    ) as pool:
+        for sample in samples:
+            wait = limiter.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            in_flight.append(pool.submit(_worker_evaluate, sample, window, threshold))
+            if len(in_flight) >= 2 * concurrency:
+                results.append(in_flight.pop(0).result())
+        results.extend(f.result() for f in in_flight)
+    return results
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_report(results: List[dict], elapsed: float, threshold: int) -> dict:
+    """Aggregate per-sample results into throughput, latency, parse and confusion stats."""
+    total = len(results)
+    latencies = [r["latency"] for r in results if "latency" in r]
+    parse_failures = sum(1 for r in results if r["parse_error"])
+    query_failures = sum(1 for r in results if r["error"] and not r["parse_error"])
+    screened = sum(1 for r in results if r.get("screened"))
+    screening_parse_failures = sum(1 for r in results if r.get("screening_parse_error"))
+    screening_query_failures = sum(
+        1 for r in results if r.get("screening_error") and not r.get("screening_parse_error")
+    )
+
+    confusion: Dict[str, Counter] = defaultdict(Counter)
+    for r in results:
+        confusion[r["expected_type"]][r["predicted_type"] or "<failed>"] += 1
+
+    # Include types that were only ever predicted, so their precision is reported too
+    all_types = set(confusion) | {p for row in confusion.values() for p in row if p != "<failed>"}
+
+    per_type = {}
+    for danger_type in all_types:
+        row = confusion.get(danger_type, Counter())
+        support = sum(row.values())
+        predicted_total = sum(c.get(danger_type, 0) for c in confusion.values())
+        correct = row.get(danger_type, 0)
+        per_type[danger_type] = {
+            "support": support,
+            "recall": correct / support if support else 0.0,
+            "precision": correct / predicted_total if predicted_total else 0.0,
+        }
+
+    # Binary danger detection at the audio_text threshold
+    tp = fp = fn = tn = 0
+    for r in results:
+        if r["expected_dangerous"] is None or r["predicted_level"] is None:
+            continue
+        predicted = r["predicted_level"] >= threshold
+        if predicted and r["expected_dangerous"]:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif r["expected_dangerous"]:
+            fn += 1
+        else:
+            tn += 1
+
+    # Cascade tiers: how often the full model was needed and what each tier missed
+    tiers: Dict[str, dict] = {}
+    for r in results:
+        tier = tiers.setdefault(r["decided_by"], {"count": 0, "tp": 0, "fn": 0})
+        tier["count"] += 1
+        if r["expected_dangerous"] and r["predicted_level"] is not None:
+            if r["predicted_level"] >= threshold:
+                tier["tp"] += 1
+            else:
+                tier["fn"] += 1
+    for tier in tiers.values():
+        tier["danger_recall"] = tier["tp"] / (tier["tp"] + tier["fn"]) if tier["tp"] + tier["fn"] else None
+    cleared = tiers.get("screening", {}).get("count", 0)
+
+    return {
+        "samples": total,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": total / elapsed if elapsed else 0.0,
+        "latency_seconds": {
+            "mean": statistics.fmean(latencies) if latencies else 0.0,
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": max(latencies) if latencies else 0.0,
+        },
+        "parse_failure_rate": parse_failures / total if total else 0.0,
+        "query_failure_rate": query_failures / total if total else 0.0,
+        # Rates over screened samples; a failed screening is always escalated to the full model
+        "screening_parse_failure_rate": screening_parse_failures / screened if screened else 0.0,
+        "screening_query_failure_rate": screening_query_failures / screened if screened else 0.0,
+        "confusion_matrix": {k: dict(v) for k, v in confusion.items()},
+        "per_type": per_type,
+        "danger_threshold": threshold,
+        "danger_detection": {
+            "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "recall": tp / (tp + fn) if tp + fn else 0.0,
+            "precision": tp / (tp + fp) if tp + fp else 0.0,
+        },
+        "escalation_rate": (total - cleared) / total if total else 0.0,
+        "tiers": tiers,
+    }
+
+
+def format_report(report: dict) -> str:
+    lat = report["latency_seconds"]
+    det = report["danger_detection"]
+    lines = [
+        f"Samples:          {report['samples']} in {report['elapsed_seconds']:.1f}s "
+        f"({report['throughput_per_second']:.2f}/s)",
+        f"Latency (s):      mean {lat['mean']:.3f}  p50 {lat['p50']:.3f}  p90 {lat['p90']:.3f}  "
+        f"p99 {lat['p99']:.3f}  max {lat['max']:.3f}",
+        f"Parse failures:   {report['parse_failure_rate']:.1%}",
+        f"Query failures:   {report['query_failure_rate']:.1%}",
+        f"Screening parse failures: {report['screening_parse_failure_rate']:.1%}  "
+        f"query failures: {report['screening_query_failure_rate']:.1%}",
+        f"Danger >= {report['danger_threshold']}:      recall {det['recall']:.3f}  precision {det['precision']:.3f}  "
+        f"(tp {det['tp']} fp {det['fp']} fn {det['fn']} tn {det['tn']})",
+        f"Escalation rate:  {report['escalation_rate']:.1%}",
+    ]
+    for name, tier in sorted(report["tiers"].items()):
+        recall = "n/a" if tier["danger_recall"] is None else f"{tier['danger_recall']:.3f}"
+        lines.append(
+            f"  tier {name.ljust(18)} {tier['count']:6d} windows  danger recall {recall}  "
+            f"(tp {tier['tp']} fn {tier['fn']})"
+        )
+    lines += [
+        "",
+        "Confusion matrix (rows = expected, columns = predicted):",
+    ]
+
+    matrix = report["confusion_matrix"]
+    columns = sorted({c for row in matrix.values() for c in row})
+    width = max([len(c) for c in columns] + [len(r) for r in matrix] + [8])
+    lines.append(" " * width + " " + " ".join(c.rjust(width) for c in columns))
+    for expected in sorted(matrix):
+        row = matrix[expected]
+        lines.append(expected.ljust(width) + " " + " ".join(str(row.get(c, 0)).rjust(width) for c in columns))
+
+    lines.append("")
+    lines.append("Per danger_type:")
+    for danger_type, stats in sorted(report["per_type"].items()):
+        lines.append(
+            f"  {danger_type.ljust(width)} support {stats['support']:5d}  "
+            f"recall {stats['recall']:.3f}  precision {stats['precision']:.3f}"
+        )
+    return "\n".join(lines)
+
+
+def run(
+    corpus: str,
+    backend: str = "keyword",
+    prompt_path: str = DEFAULT_PROMPT_PATH,
+    base_url: Optional[str] = None,
+    model_id: str = "granite-40-h-1b",
+    screening_backend: Optional[str] = None,
+    screening_prompt_path: str = SCREENING_PROMPT_PATH,
+    screening_base_url: Optional[str] = None,
+    screening_model_id: Optional[str] = None,
+    clear_below: int = SCREENING_CLEAR_BELOW,
+    fallback_above: int = SCREENING_FALLBACK_ABOVE,
+    mode: str = "async",
+    concurrency: int = 8,
+    max_rps: Optional[float] = None,
+    window: int = 6,
+    threshold: int = DANGER_LEVEL_THRESHOLD,
+    limit: Optional[int] = None,
+    report_json: Optional[str] = None,
+):
+    """
+    Evaluate the safety-analysis prompt on a labelled JSONL corpus.
+
+    screening_backend enables the two-tier cascade (same choices as backend);
+    windows scoring below clear_below on the screening tier skip the full model.
+    fallback_above only decides when the screening result stands in for a failed full model.
+    mode: "async" (threads driven by asyncio, good for remote endpoints)
+          or "process" (process pool, good for CPU-bound local stubs).
+    max_rps caps samples started per second (both modes) so a shared endpoint is not saturated;
+    with the cascade each escalated sample makes two model calls.
+    """
+    with open(prompt_path, "r", encoding="utf-8") as f:
+        prompt = f.read()
+
+    config = {
+        "backend": backend,
+        "prompt": prompt,
+        "base_url": base_url,
+        "model_id": model_id,
+        "screening_backend": screening_backend,
+        "screening_prompt": "",
+        "screening_base_url": screening_base_url,
+        "screening_model_id": screening_model_id,
+        "clear_below": clear_below,
+        "fallback_above": fallback_above,
+    }
+    if screening_backend:
+        with open(screening_prompt_path, "r", encoding="utf-8") as f:
+            config["screening_prompt"] = f.read()
+
+    samples = iter_corpus(corpus, limit=limit)
+    started = time.perf_counter()
+
+    if mode == "async":
+        pipeline = build_pipeline(config)
+        results = asyncio.run(
+            _run_async(samples, pipeline, window, threshold, concurrency, max_rps)
+        )
+    elif mode == "process":
+        results = _run_process_pool(samples, config, window, threshold, concurrency, max_rps)
+    else:
+        raise ValueError(f"Unknown mode '{mode}', expected async or process")
+
+    report = build_report(results, time.perf_counter() - started, threshold)
+    print(format_report(report))
+
+    if report_json:
+        with open(report_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    fire.Fire({"run": run})
@@ -1,11 +1,13 @@
 from llama_stack_client import LlamaStackClient
 from .response_parser import parse_model_response
 from .schemas import SafetyAnalysisResult
+from .analysis import SCREENING_CLEAR_BELOW, SCREENING_FALLBACK_ABOVE, screening_decision
 
 class   LlamaBackend:
-    def __init__(self, base_url: str, prompt: str):
+    def __init__(self, base_url: str, prompt: str, model_id: str = "granite-40-h-1b"):
         self.client = LlamaStackClient(base_url=base_url)
         self.prompt = prompt
+        self.model_id = model_id
 
     def analyze_transcript(self, transcript: str) -> SafetyAnalysisResult:
         """
@@ -13,7 +15,7 @@ class   LlamaBackend:
         Returns the raw model response.
         """
         response = self.client.inference.chat_completion(
-            model_id="granite-40-h-1b",
+            model_id=self.model_id,
             messages=[{"role": "system", "content": self.prompt}, {"role": "user", "content": transcript}],
         )
 
@@ -25,8 +27,58 @@ class   LlamaBackend:
         Returns the raw model response.
         """
         response = self.client.inference.chat_completion(
-            model_id="granite-40-h-1b",
+            model_id=self.model_id,
             messages=[{"role": "system", "content": self.prompt}, {"role": "user", "content": message}],
         )
 
-        return response.completion_message.content
\ No newline at end of file
+        return response.completion_message.content
+
+
+class CascadeBackend:
+    """
+    Two-tier model cascade.
+    Every window goes to the cheap `screener` (short prompt, small model):
+    - screening danger_level below `clear_below`: the screener's benign result is returned,
+    - anything else (or a failed screening): the full safety-analysis model decides.
+    `fallback_above` does not affect routing: if the full model fails on a window
+    the screener scored above it, the screener's result is returned so the danger
+    is still reported.
+    The returned result records which tier decided in `decided_by`.
+    """
+
+    def __init__(
+        self,
+        screener: LlamaBackend,
+        full: LlamaBackend,
+        clear_below: int = SCREENING_CLEAR_BELOW,
+        fallback_above: int = SCREENING_FALLBACK_ABOVE,
+    ):
+        self.screener = screener
+        self.full = full
+        self.clear_below = clear_below
+        self.fallback_above = fallback_above
+
+    def analyze_transcript(self, transcript: str) -> SafetyAnalysisResult:
+        try:
+            screening = self.screener.analyze_transcript(transcript)
+        except Exception as e:
+            # Never let a screening failure hide a dangerous window
+            print(f"[WalkGuardianAI] screening tier failed, escalating: {e}")
+            screening = None
+
+        decision = screening_decision(screening, self.clear_below, self.fallback_above)
+        if decision == "clear":
+            screening.decided_by = "screening"
+            return screening
+
+        try:
+            result = self.full.analyze_transcript(transcript)
+        except Exception as e:
+            if decision == "danger" and screening is not None:
+                print(f"[WalkGuardianAI] full analysis failed, using screening result: {e}")
+                screening.decided_by = "screening_fallback"
+                return screening
+            raise
+
+        result.decided_by = "full"
+        return result
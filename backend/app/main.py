@@ -2,6 +2,7 @@
 
 from fastapi import FastAPI, HTTPException
 from datetime import datetime, timezone
+import asyncio
 import uuid
 import os
 
@@ -20,11 +21,12 @@ from .schemas import (
     SafetyAnalysisResult,
 )
 
-from .analysis import analyze_text
-from .notifications import add_notification
-from .llama_client import LlamaBackend
+from .analysis import analyze_text, DANGER_LEVEL_THRESHOLD, SCREENING_CLEAR_BELOW, SCREENING_FALLBACK_ABOVE
+from .notifications import add_notification, dispatcher
+from .llama_client import LlamaBackend, CascadeBackend
 from .reverse_geocode import reverse_geocode
 from .transcript_store import TranscriptStore
+from .watchdog import watchdog
 
 # ---------------------------------------------------------
 # WalkGuardianAI - backend MVP (in-memory, multi-session)
@@ -42,16 +44,68 @@ with open(PROMPT_PATH, "r", encoding="utf-8") as f:
 #    medical_alert_prompt = f.read()
 
 # Initialize Llama Stack client
-safety_analysis_client = LlamaBackend(
-    base_url="http://lsd-llama-inference-only-service-walkguardianai-llm.apps.cluster-pzdb5.pzdb5.sandbox5281.opentlc.com",
+# Endpoints and models are configurable so the cascade can run against local stub servers
+LLAMA_BASE_URL = os.getenv(
+    "SAFETY_LLAMA_BASE_URL",
+    "http://lsd-llama-inference-only-service-walkguardianai-llm.apps.cluster-pzdb5.pzdb5.sandbox5281.opentlc.com",
+)
+full_analysis_client = LlamaBackend(
+    base_url=LLAMA_BASE_URL,
     prompt=risk_analysis_prompt,
+    model_id=os.getenv("SAFETY_MODEL_ID", "granite-40-h-1b"),
 )
+
+# Optional cheap first tier: "none" (default) or "llama" (short prompt, small model).
+# SCREENING_MODEL_ID must be set explicitly so the first tier is never the full model by accident.
+SCREENING_BACKEND = os.getenv("SCREENING_BACKEND", "none")
+if SCREENING_BACKEND == "none":
+    safety_analysis_client = full_analysis_client
+elif SCREENING_BACKEND == "llama":
+    SCREENING_MODEL_ID = os.getenv("SCREENING_MODEL_ID")
+    if not SCREENING_MODEL_ID:
+        raise ValueError("SCREENING_MODEL_ID is required when SCREENING_BACKEND=llama")
+
+    SCREENING_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "prompts", "screening_prompt.txt")
+    with open(SCREENING_PROMPT_PATH, "r", encoding="utf-8") as f:
+        screening_prompt = f.read()
+
+    # Windows scoring at or above clear_below on the first tier go to the full model;
+    # fallback_above only picks when the screening result stands in for a failed full model
+    safety_analysis_client = CascadeBackend(
+        screener=LlamaBackend(
+            base_url=os.getenv("SCREENING_BASE_URL", LLAMA_BASE_URL),
+            prompt=screening_prompt,
+            model_id=SCREENING_MODEL_ID,
+        ),
+        full=full_analysis_client,
+        clear_below=SCREENING_CLEAR_BELOW,
+        fallback_above=SCREENING_FALLBACK_ABOVE,
+    )
+else:
+    raise ValueError(f"Unknown SCREENING_BACKEND '{SCREENING_BACKEND}', expected none or llama")
+
 # medical_alert_client = LlamaBackend(
 #     base_url="http://lsd-llama-inference-only-service-walkguardianai-llm.apps.cluster-pzdb5.pzdb5.sandbox5281.opentlc.com",
 #     prompt=medical_alert_prompt,
 # )
 
 
+# ---------------------------------------------------------
+# Inactivity watchdog / notification delivery lifecycle
+# ---------------------------------------------------------
+
+@app.on_event("startup")
+async def start_watchdog():
+    watchdog.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await watchdog.stop()
+    # Deliver queued digests (e.g. SESSION_STOPPED) before the process exits
+    await dispatcher.aclose()
+
+
 # ---------------------------------------------------------
 # Health check
 # ---------------------------------------------------------
@@ -113,6 +167,7 @@ async def start_session(body: StartSessionRequest):
 
     # Save session to global sessions dict
     state.sessions[session_id] = session
+    watchdog.touch(session_id, "start")
 
     # Simulate notification to the trusted contact
     user_label = f"{body.first_name} {body.last_name}"
@@ -148,6 +203,8 @@ def update_location(body: LocationUpdateRequest):
     session["updated_at"] = (
         body.timestamp or datetime.now(timezone.utc).isoformat()
     )
+    if session["is_active"]:
+        watchdog.touch(body.session_id, "location")
 
     return {
         "status": "ACTIVE" if session["is_active"] else "FINISHED",
@@ -165,6 +222,9 @@ async def audio_text(body: AudioTextRequest):
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    if session["is_active"]:
+        watchdog.touch(body.session_id, "audio")
+
     if not session["audio_enabled"]:
         return {
             "risk": session["risk"],
@@ -175,11 +235,14 @@ async def audio_text(body: AudioTextRequest):
     session["transcript"].add_entry(body.text)
     transcript_text = session["transcript"].get_entries()
     print(f'Transcript text: {transcript_text}')
-    safety_analysis_response: SafetyAnalysisResult = safety_analysis_client.analyze_transcript(transcript_text)
+    # Model calls are blocking (up to two with the cascade) - keep them off the event loop
+    safety_analysis_response: SafetyAnalysisResult = await asyncio.to_thread(
+        safety_analysis_client.analyze_transcript, transcript_text
+    )
     # result = analyze_text(body.text)  # fallback could be used here if LLM fails
     print(f'Safety analysis response: {safety_analysis_response}')
-    # Map danger_level to simple risk labels (example: >=7 is DANGER)
-    if safety_analysis_response.danger_level >= 6 and not session["notification_sent"]:
+    # Map danger_level to simple risk labels (>= DANGER_LEVEL_THRESHOLD is DANGER)
+    if safety_analysis_response.danger_level >= DANGER_LEVEL_THRESHOLD and not session["notification_sent"]:
         session["risk"] = "DANGER"
         session["notification_sent"] = True
         if safety_analysis_response.danger_type == 'medical_distress' or safety_analysis_response.danger_type == 'mental_health_crisis':
@@ -232,7 +295,8 @@ async def audio_text(body: AudioTextRequest):
         "reason": safety_analysis_response.summary,
         "danger_level": safety_analysis_response.danger_level,
         "danger_type": safety_analysis_response.danger_type,
-        "recommended_action": safety_analysis_response.recommended_action
+        "recommended_action": safety_analysis_response.recommended_action,
+        "decided_by": safety_analysis_response.decided_by,
     }
 
 
@@ -309,6 +373,7 @@ async def stop_session(body: StopSessionRequest):
 
     session["is_active"] = False
     session["updated_at"] = datetime.now(timezone.utc).isoformat()
+    watchdog.forget(body.session_id)
 
     user = session.get("user", {})
     first_name = user.get("first_name", "")
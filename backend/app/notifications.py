@@ -1,7 +1,9 @@
 from datetime import datetime, timezone
 import httpx
+from typing import Optional
 
 from . import state
+from .delivery import NotificationDispatcher
 from .reverse_geocode import reverse_geocode
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -66,17 +68,21 @@ async def add_notification(session_id: str, notification_type: str, message: str
     )
     
 
+    # Delivery is queued per destination: DANGER events jump the queue,
+    # everything else is coalesced into short digests (see delivery.py)
+    critical = notification_type.startswith("DANGER")
+
     # Discord webhook
     if notification_type == 'DANGER_MEDICAL':
         topic = 'WalkGuardianAI-EmergencyMedicalServices'
-        await send_ntfy_message(topic, message)
+        dispatcher.enqueue("ntfy", topic, message, critical)
     elif contact.get("type") == "discord":
         webhook_url = contact.get("value")
-        await send_discord_message(webhook_url, content)
+        dispatcher.enqueue("discord", webhook_url, content, critical)
     # ntfy topic (simple push via https://ntfy.sh/<topic>)
     elif contact.get("type") == "ntfy":
         topic = f'WalkGuardianAI-{contact.get("value")}'
-        await send_ntfy_message(topic, content)
+        dispatcher.enqueue("ntfy", topic, content, critical)
 
 
 def _build_human_friendly_content(
@@ -128,10 +134,11 @@ def _build_human_friendly_content(
     return content
 
 
-async def send_discord_message(webhook_url: str, content: str) -> None:
+async def send_discord_message(webhook_url: str, content: str) -> Optional[httpx.Response]:
     """
     Send a simple message to a Discord channel using a webhook URL.
     Non-blocking and best-effort: errors are printed but do not crash the app.
+    Returns the response (None on connection errors) so the dispatcher can honour 429s.
     """
     try:
         async with httpx.AsyncClient(timeout=5.0) as client:
@@ -142,14 +149,17 @@ async def send_discord_message(webhook_url: str, content: str) -> None:
                     f"[WalkGuardianAI] Discord webhook failed: "
                     f"{response.status_code} {response.text}"
                 )
+            return response
     except Exception as e:
         print(f"[WalkGuardianAI] Error calling Discord webhook: {e}")
+        return None
 
 
-async def send_ntfy_message(topic: str, content: str) -> None:
+async def send_ntfy_message(topic: str, content: str) -> Optional[httpx.Response]:
     """
     Send a simple notification to an ntfy topic.
     The receiver can subscribe to https://ntfy.sh/<topic> in the mobile app.
+    Returns the response (None on connection errors) so the dispatcher can honour 429s.
     """
     url = f"https://ntfy.sh/{topic}"
 
@@ -162,5 +172,16 @@ async def send_ntfy_message(topic: str, content: str) -> None:
                     f"[WalkGuardianAI] ntfy notification failed: "
                     f"{response.status_code} {response.text}"
                 )
+            return response
     except Exception as e:
         print(f"[WalkGuardianAI] Error sending ntfy notification: {e}")
+        return None
+
+
+# Shared per-destination delivery queues (token buckets + digests)
+dispatcher = NotificationDispatcher(
+    {
+        "discord": send_discord_message,
+        "ntfy": send_ntfy_message,
+    }
+)
@@ -68,4 +68,6 @@ class SafetyAnalysisResult:
     danger_level: int
     danger_type: str
     summary: str
-    recommended_action: str
\ No newline at end of file
+    recommended_action: str
+    # Which cascade tier produced this result: "screening" or "full"
+    decided_by: str = "full"
\ No newline at end of file
@@ -0,0 +1,181 @@
+import asyncio
+import math
+import os
+import time
+from threading import Lock
+from typing import Dict, Optional, Set, Tuple
+
+from . import state
+from .notifications import add_notification
+
+# ---------------------------------------------------------
+# Inactivity watchdog (hashed timer wheel)
+# ---------------------------------------------------------
+#
+# Every location / audio update "touches" the session, which moves it to a
+# new slot of the wheel in O(1). A background task advances the wheel once
+# per tick and only looks at the single slot that is due, so the cost does
+# not depend on the total number of sessions in state.sessions.
+
+INACTIVITY_TIMEOUT_SECONDS = float(os.getenv("INACTIVITY_TIMEOUT_SECONDS", "60"))
+WATCHDOG_TICK_SECONDS = float(os.getenv("WATCHDOG_TICK_SECONDS", "1"))
+WATCHDOG_WHEEL_SIZE = int(os.getenv("WATCHDOG_WHEEL_SIZE", "512"))
+# Escalations run concurrently (each may wait on reverse geocoding) up to this limit
+WATCHDOG_MAX_CONCURRENT_ESCALATIONS = int(os.getenv("WATCHDOG_MAX_CONCURRENT_ESCALATIONS", "100"))
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel keyed by session_id.
+    Deadlines further away than one revolution are kept in their slot
+    and simply re-hashed when the slot comes around before they are due.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, wheel_size: int = 512):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.slots = [set() for _ in range(wheel_size)]
+        # session_id -> (slot index, deadline as monotonic time)
+        self.timers: Dict[str, Tuple[int, float]] = {}
+        self.current_tick = int(time.monotonic() / tick_seconds)
+        self.lock = Lock()
+
+    def _slot_for(self, deadline: float) -> int:
+        # Round up so the slot is never visited before the deadline has passed
+        tick = max(math.ceil(deadline / self.tick_seconds), self.current_tick + 1)
+        return tick % self.wheel_size
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Add or move a timer. O(1)."""
+        with self.lock:
+            previous = self.timers.get(key)
+            if previous is not None:
+                self.slots[previous[0]].discard(key)
+            slot = self._slot_for(deadline)
+            self.slots[slot].add(key)
+            self.timers[key] = (slot, deadline)
+
+    def cancel(self, key: str) -> None:
+        """Remove a timer if present. O(1)."""
+        with self.lock:
+            previous = self.timers.pop(key, None)
+            if previous is not None:
+                self.slots[previous[0]].discard(key)
+
+    def advance(self, now: float) -> Set[str]:
+        """
+        Move the wheel forward to `now` and return the keys that expired.
+        Expired timers are removed from the wheel.
+        """
+        expired: Set[str] = set()
+        target_tick = int(now / self.tick_seconds)
+
+        with self.lock:
+            # Never walk more than one revolution: after that every slot was visited
+            first_tick = max(self.current_tick + 1, target_tick - self.wheel_size + 1)
+            for tick in range(first_tick, target_tick + 1):
+                slot = self.slots[tick % self.wheel_size]
+                for key in list(slot):
+                    _, deadline = self.timers[key]
+                    if deadline <= now:
+                        slot.discard(key)
+                        del self.timers[key]
+                        expired.add(key)
+            self.current_tick = max(self.current_tick, target_tick)
+
+        return expired
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+
+class InactivityWatchdog:
+    """
+    Tracks the last location/audio heartbeat of every active session and
+    escalates a session that goes silent for longer than `timeout_seconds`:
+    its risk is set to DANGER (as in audio_text) and a DANGER_INACTIVITY
+    notification is raised.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = INACTIVITY_TIMEOUT_SECONDS,
+        tick_seconds: float = WATCHDOG_TICK_SECONDS,
+        wheel_size: int = WATCHDOG_WHEEL_SIZE,
+        max_concurrent_escalations: int = WATCHDOG_MAX_CONCURRENT_ESCALATIONS,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.wheel = TimerWheel(tick_seconds=tick_seconds, wheel_size=wheel_size)
+        # session_id -> last heartbeat source ("location" / "audio" / "start")
+        self.last_source: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._escalation_slots = asyncio.Semaphore(max_concurrent_escalations)
+        self._escalations: Set[asyncio.Task] = set()
+
+    def touch(self, session_id: str, source: str) -> None:
+        """
+        Record a heartbeat for the session and push its deadline forward.
+        Safe to call from sync endpoints running in the threadpool.
+        """
+        self.last_source[session_id] = source
+        self.wheel.schedule(session_id, time.monotonic() + self.timeout_seconds)
+
+    def forget(self, session_id: str) -> None:
+        """Stop watching a session (e.g. after it was stopped)."""
+        self.last_source.pop(session_id, None)
+        self.wheel.cancel(session_id)
+
+    async def _escalate(self, session_id: str) -> None:
+        session = state.sessions.get(session_id)
+        if session is None or not session["is_active"]:
+            self.last_source.pop(session_id, None)
+            return
+
+        source = self.last_source.pop(session_id, "unknown")
+        session["risk"] = "DANGER"
+        minutes = self.timeout_seconds / 60
+        await add_notification(
+            session_id,
+            "DANGER_INACTIVITY",
+            f"No location or audio updates received for {minutes:.1f} min "
+            f"(last heartbeat: {source}). The phone may be off, out of range or taken.",
+        )
+
+    async def _escalate_bounded(self, session_id: str) -> None:
+        async with self._escalation_slots:
+            try:
+                await self._escalate(session_id)
+            except Exception as e:
+                print(f"[WalkGuardianAI] watchdog escalation failed for {session_id}: {e}")
+
+    async def run(self) -> None:
+        """
+        Background loop: advance the wheel once per tick and escalate expired sessions.
+        Escalations run as separate tasks so a slow notification never stalls the wheel.
+        """
+        while True:
+            await asyncio.sleep(self.wheel.tick_seconds)
+            for session_id in self.wheel.advance(time.monotonic()):
+                task = asyncio.create_task(self._escalate_bounded(session_id))
+                self._escalations.add(task)
+                task.add_done_callback(self._escalations.discard)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop ticking and let escalations already in flight finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._escalations:
+            await asyncio.gather(*self._escalations, return_exceptions=True)
+
+
+# Single watchdog shared by the whole backend
+watchdog = InactivityWatchdog()
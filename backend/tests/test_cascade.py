@@ -0,0 +1,58 @@
+import pytest
+
+from app.llama_client import CascadeBackend
+from app.schemas import SafetyAnalysisResult
+
+
+class FakeTier:
+    def __init__(self, danger_level=None, error=None):
+        self.danger_level = danger_level
+        self.error = error
+        self.calls = 0
+
+    def analyze_transcript(self, transcript):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return SafetyAnalysisResult(self.danger_level, "unknown", "summary", "action")
+
+
+def test_below_clear_below_is_cleared_by_screening():
+    full = FakeTier(9)
+    result = CascadeBackend(FakeTier(2), full, clear_below=3, fallback_above=6).analyze_transcript("t")
+
+    assert result.decided_by == "screening"
+    assert full.calls == 0
+
+
+@pytest.mark.parametrize("screening_level", [3, 5, 6, 9])
+def test_at_or_above_clear_below_goes_to_full_model(screening_level):
+    full = FakeTier(8)
+    cascade = CascadeBackend(FakeTier(screening_level), full, clear_below=3, fallback_above=6)
+    result = cascade.analyze_transcript("t")
+
+    assert result.decided_by == "full"
+    assert result.danger_level == 8
+    assert full.calls == 1
+
+
+def test_screening_failure_escalates():
+    full = FakeTier(8)
+    cascade = CascadeBackend(FakeTier(error=RuntimeError("down")), full)
+
+    assert cascade.analyze_transcript("t").decided_by == "full"
+
+
+def test_full_failure_above_fallback_above_uses_screening():
+    cascade = CascadeBackend(FakeTier(9), FakeTier(error=RuntimeError("down")), clear_below=3, fallback_above=6)
+    result = cascade.analyze_transcript("t")
+
+    assert result.decided_by == "screening_fallback"
+    assert result.danger_level == 9
+
+
+def test_full_failure_below_fallback_above_is_raised():
+    cascade = CascadeBackend(FakeTier(5), FakeTier(error=RuntimeError("down")), clear_below=3, fallback_above=6)
+
+    with pytest.raises(RuntimeError):
+        cascade.analyze_transcript("t")
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from app import delivery
+from app.delivery import NotificationDispatcher, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return {}
+
+
+def test_token_bucket_waits_for_refill_and_retry_after():
+    bucket = TokenBucket(rate=2.0, capacity=1.0)
+    now = bucket.updated_at
+
+    assert bucket.wait_time(now) == 0.0
+    bucket.consume()
+    assert abs(bucket.wait_time(now) - 0.5) < 1e-6
+
+    bucket.blocked_until = now + 3.0
+    assert abs(bucket.wait_time(now + 1.0) - 2.0) < 1e-6
+
+
+def test_critical_events_retry_past_attempt_cap(monkeypatch):
+    monkeypatch.setattr(delivery, "MAX_DELIVERY_ATTEMPTS", 2)
+    sent = []
+    calls = {"n": 0}
+
+    async def send(target, content):
+        calls["n"] += 1
+        if calls["n"] <= 4:
+            return FakeResponse(429, {"Retry-After": "0.01"})
+        sent.append(content)
+        return FakeResponse(204)
+
+    async def scenario():
+        dispatcher = NotificationDispatcher({"discord": send})
+        dispatcher.enqueue("discord", "hook", "DANGER", critical=True)
+        await dispatcher.aclose(timeout=2)
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert sent == ["DANGER"]
+    assert dispatcher.destinations == {}
+
+
+def test_digest_sent_on_shutdown_and_critical_first(monkeypatch):
+    monkeypatch.setattr(delivery, "DIGEST_WINDOW_SECONDS", 60)
+    sent = []
+
+    async def send(target, content):
+        sent.append(content)
+        return FakeResponse(204)
+
+    async def scenario():
+        dispatcher = NotificationDispatcher({"ntfy": send})
+        dispatcher.enqueue("ntfy", "topic", "started", critical=False)
+        dispatcher.enqueue("ntfy", "topic", "stopped", critical=False)
+        dispatcher.enqueue("ntfy", "topic", "DANGER", critical=True)
+        await dispatcher.aclose(timeout=2)
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert sent == ["DANGER", "started\n\nstopped"]
+    assert dispatcher.destinations == {}
+
+
+def test_rate_limit_block_survives_idle_worker():
+    sent = []
+
+    async def send(target, content):
+        sent.append((content, time.monotonic()))
+        if content == "A":
+            return FakeResponse(204, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.3"})
+        return FakeResponse(204)
+
+    async def scenario():
+        dispatcher = NotificationDispatcher({"discord": send})
+        dispatcher.enqueue("discord", "hook", "A", critical=True)
+        await asyncio.sleep(0.05)  # queues are empty again, bucket still blocked
+        dispatcher.enqueue("discord", "hook", "B", critical=True)
+        await asyncio.sleep(0.5)
+        await dispatcher.aclose(timeout=2)
+
+    asyncio.run(scenario())
+    assert [content for content, _ in sent] == ["A", "B"]
+    assert sent[1][1] - sent[0][1] >= 0.29
+
+
+def test_critical_events_retry_on_connection_errors_and_5xx(monkeypatch):
+    monkeypatch.setattr(delivery, "RETRY_BACKOFF_SECONDS", 0.01)
+    responses = {"hook": [None, FakeResponse(503), FakeResponse(204)], "bad": [FakeResponse(400)]}
+    calls = []
+
+    async def send(target, content):
+        calls.append(target)
+        return responses[target].pop(0)
+
+    async def scenario():
+        dispatcher = NotificationDispatcher({"discord": send})
+        dispatcher.enqueue("discord", "hook", "DANGER", critical=True)
+        dispatcher.enqueue("discord", "bad", "DANGER", critical=True)
+        await asyncio.sleep(0.2)
+        await dispatcher.aclose(timeout=2)
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert calls.count("hook") == 3
+    # Non-429 4xx responses are not retried
+    assert calls.count("bad") == 1
+    assert dispatcher.destinations == {}
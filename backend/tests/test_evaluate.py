@@ -0,0 +1,79 @@
+from app.evaluate import build_report
+
+
+def result(expected_type, predicted_type, expected_dangerous, predicted_level, parse_error=False, decided_by="full"):
+    return {
+        "id": None,
+        "expected_type": expected_type,
+        "expected_dangerous": expected_dangerous,
+        "predicted_type": predicted_type,
+        "predicted_level": predicted_level,
+        "error": "parse failed" if parse_error else None,
+        "parse_error": parse_error,
+        "latency": 0.1,
+        "decided_by": decided_by,
+    }
+
+
+def test_report_covers_predicted_only_types_and_danger_detection():
+    results = [
+        result("medical_distress", "physical_threat", True, 8),
+        result("medical_distress", "medical_distress", True, 9),
+        result("unknown", "unknown", False, 2),
+        result("unknown", None, False, None, parse_error=True),
+    ]
+
+    report = build_report(results, elapsed=2.0, threshold=6)
+
+    assert report["throughput_per_second"] == 2.0
+    assert report["parse_failure_rate"] == 0.25
+    # physical_threat was only predicted, never labelled
+    assert report["per_type"]["physical_threat"] == {"support": 0, "recall": 0.0, "precision": 0.0}
+    assert report["per_type"]["medical_distress"]["recall"] == 0.5
+    assert report["per_type"]["medical_distress"]["precision"] == 1.0
+    assert "<failed>" not in report["per_type"]
+    assert report["danger_detection"]["tp"] == 2
+    assert report["danger_detection"]["tn"] == 1
+
+
+def test_cascade_clears_only_below_clear_below_and_reports_tiers():
+    from app.evaluate import Pipeline, evaluate_sample
+
+    def screen(prompt, transcript):
+        level = 1 if "weather" in transcript else 4
+        return f"danger_level: {level}\ndanger_type: unknown\nsummary: s\nrecommended_action: a"
+
+    def full(prompt, transcript):
+        return "danger_level: 9\ndanger_type: medical_distress\nsummary: s\nrecommended_action: a"
+
+    pipeline = Pipeline(query=full, prompt="", screen_query=screen, clear_below=3, fallback_above=6)
+    samples = [
+        {"text": "nice weather today", "danger_type": "unknown", "dangerous": False},
+        {"text": "I can't breathe, chest pain", "danger_type": "medical_distress", "dangerous": True},
+    ]
+    results = [evaluate_sample(pipeline, s, window=6, threshold=6) for s in samples]
+
+    assert [r["decided_by"] for r in results] == ["screening", "full"]
+    report = build_report(results, elapsed=1.0, threshold=6)
+    assert report["escalation_rate"] == 0.5
+    assert report["tiers"]["full"]["danger_recall"] == 1.0
+    assert report["tiers"]["screening"]["danger_recall"] is None
+
+
+def test_screening_parse_failures_are_reported_and_escalated():
+    from app.evaluate import Pipeline, evaluate_sample
+
+    def screen(prompt, transcript):
+        return "this is not the expected format"
+
+    def full(prompt, transcript):
+        return "danger_level: 2\ndanger_type: unknown\nsummary: s\nrecommended_action: a"
+
+    pipeline = Pipeline(query=full, prompt="", screen_query=screen)
+    results = [evaluate_sample(pipeline, {"text": "hello"}, window=6, threshold=6)]
+
+    assert results[0]["decided_by"] == "full"
+    report = build_report(results, elapsed=1.0, threshold=6)
+    assert report["screening_parse_failure_rate"] == 1.0
+    assert report["screening_query_failure_rate"] == 0.0
+    assert report["parse_failure_rate"] == 0.0
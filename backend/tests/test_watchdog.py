@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+from app import state
+from app import watchdog as watchdog_module
+from app.watchdog import InactivityWatchdog, TimerWheel
+
+
+def make_wheel(wheel_size: int = 8) -> TimerWheel:
+    wheel = TimerWheel(tick_seconds=1.0, wheel_size=wheel_size)
+    wheel.current_tick = 0
+    return wheel
+
+
+def test_expires_only_after_deadline():
+    wheel = make_wheel()
+    wheel.schedule("a", 3.5)
+
+    assert wheel.advance(3.0) == set()
+    assert wheel.advance(4.0) == {"a"}
+    assert len(wheel) == 0
+
+
+def test_reschedule_moves_timer():
+    wheel = make_wheel()
+    wheel.schedule("a", 2.0)
+    wheel.schedule("a", 6.0)
+
+    assert wheel.advance(3.0) == set()
+    assert wheel.advance(6.0) == {"a"}
+
+
+def test_deadline_more_than_one_revolution_ahead():
+    wheel = make_wheel(wheel_size=8)
+    wheel.schedule("far", 20.5)
+
+    # The slot comes around twice before the deadline is reached
+    for now in range(1, 21):
+        assert wheel.advance(float(now)) == set()
+    assert wheel.advance(21.0) == {"far"}
+
+
+def test_catch_up_after_long_pause():
+    wheel = make_wheel(wheel_size=8)
+    wheel.schedule("a", 2.0)
+    wheel.schedule("b", 5.0)
+    wheel.schedule("c", 30.0)
+
+    # One call far past several revolutions still expires everything due
+    assert wheel.advance(100.0) == {"a", "b", "c"}
+    assert wheel.current_tick == 100
+
+
+def test_cancel():
+    wheel = make_wheel()
+    wheel.schedule("a", 2.0)
+    wheel.cancel("a")
+
+    assert wheel.advance(10.0) == set()
+
+
+def run_watchdog(monkeypatch, sessions, scenario, notify_delay=0.0):
+    """Run `scenario(watchdog)` against a fast watchdog with a fake notifier."""
+    notifications = []
+
+    async def fake_add_notification(session_id, notification_type, message):
+        await asyncio.sleep(notify_delay)
+        notifications.append((session_id, notification_type, time.monotonic()))
+
+    monkeypatch.setattr(watchdog_module, "add_notification", fake_add_notification)
+    monkeypatch.setattr(state, "sessions", sessions)
+
+    async def main():
+        watchdog = InactivityWatchdog(timeout_seconds=0.05, tick_seconds=0.01, wheel_size=16)
+        watchdog.start()
+        try:
+            await scenario(watchdog)
+        finally:
+            await watchdog.stop()
+
+    asyncio.run(main())
+    return notifications
+
+
+def session(active=True):
+    return {"is_active": active, "risk": "SAFE"}
+
+
+def test_watchdog_escalates_silent_session(monkeypatch):
+    sessions = {"s1": session()}
+
+    async def scenario(watchdog):
+        watchdog.touch("s1", "location")
+        await asyncio.sleep(0.2)
+
+    notifications = run_watchdog(monkeypatch, sessions, scenario)
+
+    assert [(n[0], n[1]) for n in notifications] == [("s1", "DANGER_INACTIVITY")]
+    assert sessions["s1"]["risk"] == "DANGER"
+
+
+def test_watchdog_skips_inactive_and_forgotten_sessions(monkeypatch):
+    sessions = {"stopped": session(active=False), "forgotten": session(), "alive": session()}
+
+    async def scenario(watchdog):
+        for session_id in sessions:
+            watchdog.touch(session_id, "audio")
+        watchdog.forget("forgotten")
+        # Keep "alive" sending heartbeats past the timeout
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            watchdog.touch("alive", "location")
+
+    notifications = run_watchdog(monkeypatch, sessions, scenario)
+
+    assert notifications == []
+    assert all(s["risk"] == "SAFE" for s in sessions.values())
+
+
+def test_watchdog_escalations_do_not_block_each_other(monkeypatch):
+    sessions = {f"s{i}": session() for i in range(10)}
+
+    async def scenario(watchdog):
+        for session_id in sessions:
+            watchdog.touch(session_id, "location")
+        await asyncio.sleep(0.5)
+
+    notifications = run_watchdog(monkeypatch, sessions, scenario, notify_delay=0.2)
+
+    assert len(notifications) == 10
+    sent_at = [n[2] for n in notifications]
+    # Run concurrently: all done within one notifier delay of each other, not 10 x 0.2s
+    assert max(sent_at) - min(sent_at) < 0.1